@@ -4,60 +4,203 @@ Implements the schema.json declarative repository specification.
 Configuration is stored in SQLite database - schema.json is only used for initial load.
 """
 
-import json
+import base64
+import bisect
+import functools
 import os
+import re
 import hashlib
+import threading
 import time
-from datetime import datetime
+import uuid
+from operator import itemgetter, methodcaller
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple, List, Callable
 
-from flask import Flask, request, jsonify, send_file, Response
+from flask import Flask, request, jsonify, send_file, Response, g
+from flask.json.provider import JSONProvider, DefaultJSONProvider
 from flask_cors import CORS
 import jwt
+import orjson
 from werkzeug.exceptions import HTTPException
-import jsonschema
 
 import auth_sqlalchemy as auth_module
 import config_db_sqlalchemy as config_db
-from rocksdb_store import RocksDBStore
+from rocksdb_store import RocksDBStore, GroupCommitWriter
+
+class OrjsonProvider(JSONProvider):
+    """JSON provider using orjson for request parsing and jsonify responses."""
+    
+    option = orjson.OPT_NON_STR_KEYS
+    
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option).decode('utf-8')
+    
+    def loads(self, s, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args: Any, **kwargs: Any) -> Response:
+        # Skip the bytes -> str -> bytes round trip dumps() would add
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.option)
+        return self._app.response_class(body, mimetype="application/json")
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
 
 # Load schema.json for reference
 SCHEMA_PATH = Path(__file__).parent.parent / "schema.json"
 try:
-    with open(SCHEMA_PATH) as f:
-        SCHEMA = json.load(f)
-except (FileNotFoundError, json.JSONDecodeError) as e:
+    # Parse the raw bytes with orjson: no text-mode decode pass
+    SCHEMA = orjson.loads(SCHEMA_PATH.read_bytes())
+except (FileNotFoundError, orjson.JSONDecodeError) as e:
     print(f"Error loading schema.json: {e}")
     SCHEMA = {"ops": {"limits": {"max_request_body_bytes": 2147483648}}}  # Default fallback
 
+# The schema is immutable after load, so serialize and fingerprint it once
+SCHEMA_JSON_BYTES = orjson.dumps(SCHEMA)
+SCHEMA_ETAG = hashlib.sha256(SCHEMA_JSON_BYTES).hexdigest()
+
 # Configuration is now loaded from database using SQLAlchemy
 # schema.json is only used once during initial database setup
 DB_CONFIG = config_db.get_repository_config()
 
+# Admin reads are served from an in-memory copy of the configuration: the
+# admin write endpoints drop it immediately, and the TTL picks up changes
+# made outside this process (seed scripts, another instance).
+CONFIG_CACHE_TTL_SECONDS = float(os.environ.get("CONFIG_CACHE_TTL_SECONDS", "60"))
+_config_cache: Tuple[float, Optional[Dict[str, Any]]] = (
+    time.monotonic() + CONFIG_CACHE_TTL_SECONDS, DB_CONFIG
+)
+
+
+def get_repository_config() -> Optional[Dict[str, Any]]:
+    """Return the repository configuration, reading the database at most once per TTL."""
+    global _config_cache
+    expires_at, config = _config_cache
+    if time.monotonic() >= expires_at:
+        config = config_db.get_repository_config()
+        _config_cache = (time.monotonic() + CONFIG_CACHE_TTL_SECONDS, config)
+    return config
+
+
+def invalidate_config_cache() -> None:
+    """Force the next get_repository_config() call to reread the database."""
+    global _config_cache
+    _config_cache = (0.0, None)
+
+
 # Configuration
 DATA_DIR = Path(os.environ.get("DATA_DIR", "/tmp/data"))
 BLOB_DIR = DATA_DIR / "blobs"
+# In-progress uploads; same filesystem as BLOB_DIR so they can be linked in
+BLOB_TMP_DIR = BLOB_DIR / ".tmp"
 META_DIR = DATA_DIR / "meta"
 ROCKSDB_DIR = DATA_DIR / "rocksdb"
 JWT_SECRET = os.environ.get("JWT_SECRET", "dev-secret-key")
 # Control whether anonymous reads are allowed. Default: False (auth required for reads)
 ALLOW_ANON_READ = os.environ.get("ALLOW_ANON_READ", "false").lower() == "true"
+# Digest algorithm for newly uploaded blobs. Default: sha256 (as declared in
+# schema.json). blake2b (256-bit) hashes faster on CPUs without SHA
+# extensions. Stored digests carry their algorithm prefix, so blobs written
+# under either setting keep resolving after a switch.
+BLOB_DIGEST_ALGORITHM = os.environ.get("BLOB_DIGEST_ALGORITHM", "sha256").lower()
+_BLOB_HASHERS: Dict[str, Callable[[], Any]] = {
+    "sha256": hashlib.sha256,
+    "blake2b": functools.partial(hashlib.blake2b, digest_size=32),
+}
+if BLOB_DIGEST_ALGORITHM not in _BLOB_HASHERS:
+    raise ValueError(f"Unsupported BLOB_DIGEST_ALGORITHM: {BLOB_DIGEST_ALGORITHM}")
+# Hand blob downloads to a fronting web server instead of streaming them
+# through Python. BLOB_ACCEL_REDIRECT_PREFIX (nginx) is an internal location
+# mapped to BLOB_DIR, e.g. "/_blobs"; USE_X_SENDFILE (Apache/lighttpd) makes
+# send_file emit an X-Sendfile header with the blob's path.
+BLOB_ACCEL_REDIRECT_PREFIX = os.environ.get("BLOB_ACCEL_REDIRECT_PREFIX", "").rstrip("/")
+USE_X_SENDFILE = os.environ.get("USE_X_SENDFILE", "false").lower() == "true"
+app.config["USE_X_SENDFILE"] = USE_X_SENDFILE
 
 # Initialize storage
 BLOB_DIR.mkdir(parents=True, exist_ok=True)
+BLOB_TMP_DIR.mkdir(parents=True, exist_ok=True)
 META_DIR.mkdir(parents=True, exist_ok=True)
 ROCKSDB_DIR.mkdir(parents=True, exist_ok=True)
 
 # RocksDB KV store (replaces in-memory dict)
 kv_store = RocksDBStore(str(ROCKSDB_DIR))
 
-# Index store - currently in-memory, could be migrated to RocksDB in the future
-# for full persistence and consistency across restarts
-index_store: Dict[str, list] = {}
+# Uploads cut off by a crash or restart leave their temp files behind. Opening
+# the store above took RocksDB's lock on the data directory, so no other
+# process can be uploading into it now and none of these are in flight.
+for stale_upload in BLOB_TMP_DIR.iterdir():
+    stale_upload.unlink(missing_ok=True)
+
+# Durable metadata writes go through a group-commit writer: concurrent
+# publishes queued within a few milliseconds share one synced WriteBatch
+metadata_writer = GroupCommitWriter(kv_store)
+
+# Index store - in-memory view of the version index keyed by (namespace, name).
+# Each value is a list of (version_sort_key(version), row) pairs kept in
+# ascending version order, so the latest version is the last element.
+# Artifact metadata is the source of truth in RocksDB, so the index is rebuilt
+# from it on startup. RocksDB keys stay strings; tuples are cheaper to build
+# and hash for this process-local dict.
+index_store: Dict[Tuple[str, str], List[Tuple[tuple, Dict[str, Any]]]] = {}
+
+
+# Striped locks guarding check-then-set sequences on kv_store/index_store.
+# Writers to different packages rarely contend; same-package writers serialize.
+_index_locks = [threading.Lock() for _ in range(16)]
+
+
+def index_lock(index_key: Tuple[str, str]) -> threading.Lock:
+    """Return the lock stripe guarding a (namespace, name) index entry."""
+    return _index_locks[hash(index_key) & 15]
+
+
+def index_entry(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the version index row for an artifact's metadata."""
+    return {
+        "namespace": meta["namespace"],
+        "name": meta["name"],
+        "version": meta["version"],
+        "variant": meta["variant"],
+        "blob_digest": meta["blob_digest"]
+    }
+
+
+def version_sort_key(version: str) -> tuple:
+    """Build a semver-style ordering key for a version string.
+    
+    Dot-separated numeric parts compare as integers (so 10.0.0 > 2.0.0),
+    build metadata after "+" is ignored, and a pre-release ("1.0.0-rc1")
+    sorts before its release. Parsed once per row on insert.
+    """
+    core = version.partition("+")[0]
+    release, sep, prerelease = core.partition("-")
+    
+    def parts(s: str) -> tuple:
+        return tuple((0, int(p), "") if p.isdecimal() else (1, 0, p) for p in s.split("."))
+    
+    return (parts(release), (0, parts(prerelease)) if sep else (1,))
+
+
+_row_sort_key = itemgetter(0)
+
+
+def load_index() -> None:
+    """Rebuild index_store from metadata persisted in RocksDB."""
+    index_store.clear()
+    for _, meta in kv_store.scan("artifact/"):
+        index_key = (meta['namespace'], meta['name'])
+        index_store.setdefault(index_key, []).append((version_sort_key(meta['version']), index_entry(meta)))
+    
+    for rows in index_store.values():
+        rows.sort(key=_row_sort_key)
+
+
+load_index()
 
 
 class RepositoryError(Exception):
@@ -69,43 +212,105 @@ class RepositoryError(Exception):
         super().__init__(self.message)
 
 
-def get_blob_path(digest: str) -> Path:
-    """Generate blob storage path based on database configuration."""
-    # Remove sha256: prefix if present
-    clean_digest = digest.replace("sha256:", "")
-    
-    # Get blob store config from database
-    config = config_db.get_repository_config()
-    if config and config.get('blob_stores'):
-        # Use first blob store for now (could be extended to support multiple)
-        blob_store = config['blob_stores'][0]
-        # Use path template from database: sha256/{digest:0:2}/{digest:2:2}/{digest}
-        return BLOB_DIR / clean_digest[:2] / clean_digest[2:4] / clean_digest
+_BLOB_DIR_STR = str(BLOB_DIR)
+
+
+@functools.lru_cache(maxsize=8192)
+def get_blob_path(digest: str) -> str:
+    """Generate blob storage path for a digest.
     
-    # Fallback to default path
-    return BLOB_DIR / clean_digest[:2] / clean_digest[2:4] / clean_digest
+    Follows the blob store path template {digest:0:2}/{digest:2:2}/{digest}.
+    Built as a plain string (no Path joins) and cached, since the same blobs
+    are fetched repeatedly.
+    """
+    clean_digest = digest.rpartition(":")[2]  # strip "sha256:" / "blake2b:"
+    return f"{_BLOB_DIR_STR}/{clean_digest[:2]}/{clean_digest[2:4]}/{clean_digest}"
+
+
+# Verified JWT payloads keyed by the raw token: token -> (expires_at, payload).
+# The token string is used directly so a lookup costs one dict hash rather
+# than a cryptographic digest; memory stays bounded by JWT_CACHE_MAX_ENTRIES.
+# Only successfully verified tokens are cached; entries never outlive "exp".
+# Tokens are stateless (no revocation list), so the TTL can safely be raised
+# up to the token lifetime to serve nearly every request from the cache.
+JWT_CACHE_TTL_SECONDS = float(os.environ.get("JWT_CACHE_TTL_SECONDS", "5"))
+JWT_CACHE_MAX_ENTRIES = 10000
+_jwt_cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+_jwt_cache_lock = threading.Lock()
 
 
 def verify_token(token: str) -> Dict[str, Any]:
     """Verify JWT token and return principal."""
+    now = time.time()
+    
+    cached = _jwt_cache.get(token)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        return payload
     except jwt.InvalidTokenError:
         raise RepositoryError("Invalid token", 401, "UNAUTHORIZED")
+    
+    expires_at = min(payload.get('exp', now + JWT_CACHE_TTL_SECONDS), now + JWT_CACHE_TTL_SECONDS)
+    with _jwt_cache_lock:
+        _jwt_cache.pop(token, None)
+        if len(_jwt_cache) >= JWT_CACHE_MAX_ENTRIES:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            _jwt_cache.pop(next(iter(_jwt_cache)))
+        _jwt_cache[token] = (expires_at, payload)
+    
+    return payload
+
+
+@app.before_request
+def load_principal():
+    """Parse the Authorization header once and attach the principal to g."""
+    g.principal = None
+    g.auth_error = None
+    
+    auth_header = request.headers.get("Authorization", "")
+    if auth_header.startswith("Bearer "):
+        try:
+            g.principal = verify_token(auth_header[7:])
+        except RepositoryError as e:
+            g.auth_error = e
+
+
+# Last formatted timestamp: (epoch second, ISO string). Replaced as a whole
+# tuple, so concurrent readers always see a consistent pair.
+_timestamp_cache: Tuple[int, str] = (-1, "")
+
+
+def request_timestamp() -> str:
+    """Return the current UTC timestamp (second precision).
+    
+    The string is formatted at most once per second process-wide; every
+    other call is an int compare against the cached second.
+    """
+    global _timestamp_cache
+    now = int(time.time())
+    cached = _timestamp_cache
+    if cached[0] != now:
+        cached = _timestamp_cache = (now, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now)))
+    return cached[1]
+
+
+def require_principal() -> Dict[str, Any]:
+    """Return the authenticated principal or raise 401."""
+    if g.principal is None:
+        raise g.auth_error or RepositoryError("Missing authorization", 401, "UNAUTHORIZED")
+    return g.principal
 
 
 def require_scopes(required_scopes: list) -> Optional[Dict[str, Any]]:
     """Check if request has required scopes."""
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
+    if g.principal is None and g.auth_error is None:
         # Allow unauthenticated read access only if explicitly enabled
         if "read" in required_scopes and ALLOW_ANON_READ:
             return {"sub": "anonymous", "scopes": ["read"]}
-        raise RepositoryError("Missing authorization", 401, "UNAUTHORIZED")
     
-    token = auth_header[7:]
-    principal = verify_token(token)
+    principal = require_principal()
     
     user_scopes = principal.get("scopes", [])
     if not any(scope in user_scopes for scope in required_scopes):
@@ -114,80 +319,235 @@ def require_scopes(required_scopes: list) -> Optional[Dict[str, Any]]:
     return principal
 
 
-def get_entity_config(entity_name: str = "artifact") -> Optional[Dict[str, Any]]:
-    """Get entity configuration from database."""
-    config = config_db.get_repository_config()
-    if not config or 'entities' not in config:
-        return None
+def conditional_json(payload: Dict[str, Any]) -> Response:
+    """jsonify() with a body-derived ETag, answering If-None-Match with 304."""
+    response = jsonify(payload)
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def requires(*scopes: str) -> Callable:
+    """Route decorator that runs require_scopes() before the view.
     
-    for entity in config['entities']:
-        if entity['name'] == entity_name:
-            return entity
+    Views that need the caller's identity read it from g.principal.
+    """
+    required_scopes = list(scopes)
     
+    def decorator(view: Callable) -> Callable:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            require_scopes(required_scopes)
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Constraints compiled once from the database configuration:
+# entity_type -> ((field, compiled regex, when_present), ...)
+_CONSTRAINTS: Dict[str, Tuple[Tuple[str, "re.Pattern[str]", bool], ...]] = {}
+
+# Normalization plans compiled once from the database configuration:
+# entity_type -> [(field, optional, (op, ...)), ...]
+_NORM_PLANS: Dict[str, List[Tuple[str, bool, Tuple[Callable[[str], str], ...]]]] = {}
+
+# Same plans for values taken from URL path segments, with "trim" dropped:
+# canonical URLs don't pad segments, and percent-encoded padding is left in
+# place for the entity constraints to reject instead of being silently
+# stripped. An entity type whose plan reduces to no ops at all maps to None
+# so the input is returned untouched.
+_URL_NORM_PLANS: Dict[str, Optional[List[Tuple[str, bool, Tuple[Callable[[str], str], ...]]]]] = {}
+
+# URL normalization ops per field, for handlers that only need a couple of
+# fields: entity_type -> {field: (op, ...)}
+_URL_FIELD_OPS: Dict[str, Dict[str, Tuple[Callable[[str], str], ...]]] = {}
+
+
+def _compile_normalization(norm: str) -> Optional[Callable[[str], str]]:
+    """Turn a schema normalization rule into a string callable."""
+    if norm == "trim":
+        return str.strip
+    if norm == "lower":
+        return str.lower
+    if norm.startswith("replace:"):
+        parts = norm.split(":")
+        if len(parts) == 3:
+            return methodcaller("replace", parts[1], parts[2])
     return None
 
 
-def normalize_entity(entity_data: Dict[str, Any], entity_type: str = "artifact") -> Dict[str, Any]:
-    """Normalize entity fields based on database schema configuration."""
-    entity_config = get_entity_config(entity_type)
-    if not entity_config:
+def _compile_schema(config: Optional[Dict[str, Any]]) -> None:
+    """Precompile per-entity rules so requests don't re-parse them."""
+    _CONSTRAINTS.clear()
+    _NORM_PLANS.clear()
+    _URL_NORM_PLANS.clear()
+    _URL_FIELD_OPS.clear()
+    if not config:
+        return
+    
+    for entity in config.get('entities', []):
+        plan = []
+        for field in entity.get('fields', []):
+            ops = tuple(
+                op for op in map(_compile_normalization, orjson.loads(field.get('normalizations') or '[]'))
+                if op is not None
+            )
+            plan.append((field['name'], bool(field.get('optional')), ops))
+        _NORM_PLANS[entity['name']] = plan
+        
+        url_plan = [
+            (name, optional, tuple(op for op in ops if op is not str.strip))
+            for name, optional, ops in plan
+        ]
+        _URL_NORM_PLANS[entity['name']] = url_plan if any(ops for _, _, ops in url_plan) else None
+        _URL_FIELD_OPS[entity['name']] = {name: ops for name, _, ops in url_plan}
+        
+        _CONSTRAINTS[entity['name']] = tuple(
+            (constraint['field'], re.compile(constraint['regex']), bool(constraint.get('when_present')))
+            for constraint in entity.get('constraints', [])
+            if constraint.get('regex')
+        )
+
+
+_compile_schema(DB_CONFIG)
+
+
+def normalize_entity(entity_data: Dict[str, Any], entity_type: str = "artifact", source: str = "body") -> Dict[str, Any]:
+    """Normalize entity fields based on database schema configuration.
+    
+    Pass source="url" when every value comes from URL path segments to use
+    the reduced plan that skips trimming.
+    """
+    plan = (_URL_NORM_PLANS if source == "url" else _NORM_PLANS).get(entity_type)
+    if plan is None:
         return entity_data
     
     normalized = {}
     
-    for field in entity_config.get('fields', []):
-        field_name = field['name']
+    for field_name, optional, ops in plan:
         value = entity_data.get(field_name)
         
         if value is None:
-            if not field.get('optional', False):
+            if not optional:
                 normalized[field_name] = ""
             continue
         
-        # Apply normalization rules from database
-        normalizations = json.loads(field.get('normalizations', '[]'))
-        for norm in normalizations:
-            if norm == "trim":
-                value = value.strip()
-            elif norm == "lower":
-                value = value.lower()
-            elif norm.startswith("replace:"):
-                parts = norm.split(":")
-                if len(parts) == 3:
-                    value = value.replace(parts[1], parts[2])
+        for op in ops:
+            value = op(value)
         
         normalized[field_name] = value
     
     return normalized
 
 
+def normalize_package_name(namespace: str, name: str) -> Tuple[str, str]:
+    """Normalize just the namespace and name URL segments of an artifact.
+    
+    Equivalent to normalize_entity(..., source="url") for those two fields,
+    without building and walking a whole entity dict.
+    """
+    field_ops = _URL_FIELD_OPS.get("artifact", {})
+    for op in field_ops.get("namespace", ()):
+        namespace = op(namespace)
+    for op in field_ops.get("name", ()):
+        name = op(name)
+    return namespace, name
+
+
 def validate_entity(entity_data: Dict[str, Any], entity_type: str = "artifact") -> None:
     """Validate entity against database schema constraints."""
-    entity_config = get_entity_config(entity_type)
-    if not entity_config:
-        return
-    
-    for constraint in entity_config.get('constraints', []):
-        field = constraint['field']
+    for field, pattern, when_present in _CONSTRAINTS.get(entity_type, ()):
         value = entity_data.get(field)
         
         # Skip validation if field is optional and not present
-        if constraint.get('when_present', False) and not value:
+        if when_present and not value:
             continue
         
-        if value and 'regex' in constraint:
-            import re
-            if not re.match(constraint['regex'], value):
-                raise RepositoryError(
-                    f"Invalid {field}: does not match pattern {constraint['regex']}",
-                    400,
-                    "VALIDATION_ERROR"
-                )
+        # fullmatch: with match(), a "$" also matches before a trailing
+        # newline, so "1.0.0\n" from a %0A-suffixed URL segment would pass
+        if value and not pattern.fullmatch(value):
+            raise RepositoryError(
+                f"Invalid {field}: does not match pattern {pattern.pattern}",
+                400,
+                "VALIDATION_ERROR"
+            )
+
+
+UPLOAD_CHUNK_BYTES = 1 << 20  # 1 MiB
 
 
-def compute_blob_digest(data: bytes) -> str:
-    """Compute SHA256 digest of blob data."""
-    return "sha256:" + hashlib.sha256(data).hexdigest()
+@functools.lru_cache(maxsize=4096)
+def ensure_blob_dir(path: str) -> None:
+    """Create a blob fan-out directory and make each new level durable.
+    
+    With the 256x256 prefix layout nearly every upload lands in a directory
+    that already exists, so the common case is a single stat. A level that
+    does get created has its parent fsynced, so the new entry survives a
+    power loss along with the blob linked into it.
+    """
+    if os.path.isdir(path):
+        return
+    parent = os.path.dirname(path)
+    ensure_blob_dir(parent)
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        pass  # Created concurrently; syncing the parent again is harmless
+    fsync_dir(parent)
+
+
+def fsync_dir(path: str) -> None:
+    """Flush a directory's entries (e.g. a new link) to disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def store_blob_stream(stream, max_bytes: int) -> Tuple[str, int]:
+    """Stream a blob to disk while hashing it; return (digest, size).
+    
+    The body is read in fixed-size chunks that are hashed and written in the
+    same pass, so memory use stays constant regardless of blob size;
+    hashlib releases the GIL while hashing each chunk. Plain read() is used
+    rather than readinto(): gunicorn's request body has no readinto(), so
+    werkzeug would emulate it with a read() plus an extra copy.
+    """
+    hasher = _BLOB_HASHERS[BLOB_DIGEST_ALGORITHM]()
+    size = 0
+    tmp_path = BLOB_TMP_DIR / f"upload-{uuid.uuid4().hex}"
+    
+    try:
+        with open(tmp_path, "wb") as f:
+            while chunk := stream.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise RepositoryError("Blob too large", 413, "BLOB_TOO_LARGE")
+                hasher.update(chunk)
+                f.write(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        digest = f"{BLOB_DIGEST_ALGORITHM}:{hasher.hexdigest()}"
+        blob_path = get_blob_path(digest)
+        blob_dir = os.path.dirname(blob_path)
+        ensure_blob_dir(blob_dir)
+        
+        # Linking fails atomically if the target exists, so there is no
+        # separate existence check to race against. The blob is durable
+        # before the caller commits metadata that points at it, so a crash
+        # can at worst orphan a blob, never leave metadata dangling.
+        try:
+            os.link(tmp_path, blob_path)
+            fsync_dir(blob_dir)
+        except FileExistsError:
+            pass  # Content-addressed: identical blob already stored
+        tmp_path.unlink()
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    return digest, size
 
 
 @app.route("/auth/login", methods=["POST"])
@@ -222,15 +582,7 @@ def login():
 def change_password():
     """Change password endpoint."""
     # Must be authenticated
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        raise RepositoryError("Missing authorization", 401, "UNAUTHORIZED")
-    
-    token = auth_header[7:]
-    try:
-        principal = verify_token(token)
-    except:
-        raise RepositoryError("Invalid token", 401, "UNAUTHORIZED")
+    principal = require_principal()
     
     try:
         data = request.get_json()
@@ -256,72 +608,53 @@ def change_password():
 @app.route("/auth/me", methods=["GET"])
 def get_current_user():
     """Get current user info from token."""
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        raise RepositoryError("Missing authorization", 401, "UNAUTHORIZED")
-    
-    token = auth_header[7:]
-    try:
-        principal = verify_token(token)
-        return jsonify({
-            "ok": True,
-            "user": {
-                "username": principal['sub'],
-                "scopes": principal.get('scopes', [])
-            }
-        })
-    except:
-        raise RepositoryError("Invalid token", 401, "UNAUTHORIZED")
+    principal = require_principal()
+    return jsonify({
+        "ok": True,
+        "user": {
+            "username": principal['sub'],
+            "scopes": principal.get('scopes', [])
+        }
+    })
 
 
 @app.route("/admin/config", methods=["GET"])
 def get_admin_config():
     """Get repository configuration from database."""
     # Must be admin
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        raise RepositoryError("Missing authorization", 401, "UNAUTHORIZED")
-    
-    token = auth_header[7:]
-    try:
-        principal = verify_token(token)
-        if 'admin' not in principal.get('scopes', []):
-            raise RepositoryError("Admin access required", 403, "FORBIDDEN")
-    except:
-        raise RepositoryError("Invalid token", 401, "UNAUTHORIZED")
+    principal = require_principal()
+    if 'admin' not in principal.get('scopes', []):
+        raise RepositoryError("Admin access required", 403, "FORBIDDEN")
     
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "config": config})
+    return conditional_json({"ok": True, "config": config})
 
 
 @app.route("/admin/entities", methods=["GET"])
+@requires("admin")
 def list_entities():
     """List all entities."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "entities": config.get('entities', [])})
+    return conditional_json({"ok": True, "entities": config.get('entities', [])})
 
 
 @app.route("/admin/entities", methods=["POST"])
+@requires("admin")
 def create_entity():
     """Create a new entity."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
     try:
         data = request.get_json()
         if not data or 'name' not in data:
             raise RepositoryError("Missing entity name", 400, "INVALID_REQUEST")
         
         # TODO: Implement entity creation in config_db
+        invalidate_config_cache()
         return jsonify({"ok": True, "message": "Entity creation not yet implemented"})
     except RepositoryError:
         raise
@@ -330,30 +663,27 @@ def create_entity():
 
 
 @app.route("/admin/routes", methods=["GET"])
+@requires("admin")
 def list_routes():
     """List all API routes."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "routes": config.get('api_routes', [])})
+    return conditional_json({"ok": True, "routes": config.get('api_routes', [])})
 
 
 @app.route("/admin/routes", methods=["POST"])
+@requires("admin")
 def create_route():
     """Create a new API route."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
     try:
         data = request.get_json()
         if not data or 'route_id' not in data:
             raise RepositoryError("Missing route_id", 400, "INVALID_REQUEST")
         
         # TODO: Implement route creation in config_db
+        invalidate_config_cache()
         return jsonify({"ok": True, "message": "Route creation not yet implemented"})
     except RepositoryError:
         raise
@@ -362,30 +692,27 @@ def create_route():
 
 
 @app.route("/admin/blob-stores", methods=["GET"])
+@requires("admin")
 def list_blob_stores():
     """List all blob stores."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "blob_stores": config.get('blob_stores', [])})
+    return conditional_json({"ok": True, "blob_stores": config.get('blob_stores', [])})
 
 
 @app.route("/admin/blob-stores", methods=["POST"])
+@requires("admin")
 def create_blob_store():
     """Create a new blob store."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
     try:
         data = request.get_json()
         if not data or 'name' not in data:
             raise RepositoryError("Missing store name", 400, "INVALID_REQUEST")
         
         # TODO: Implement blob store creation in config_db
+        invalidate_config_cache()
         return jsonify({"ok": True, "message": "Blob store creation not yet implemented"})
     except RepositoryError:
         raise
@@ -394,43 +721,38 @@ def create_blob_store():
 
 
 @app.route("/admin/auth/scopes", methods=["GET"])
+@requires("admin")
 def list_auth_scopes():
     """List all auth scopes."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "scopes": config.get('auth_scopes', [])})
+    return conditional_json({"ok": True, "scopes": config.get('auth_scopes', [])})
 
 
 @app.route("/admin/features", methods=["GET"])
+@requires("admin")
 def get_features():
     """Get features configuration."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
-    config = config_db.get_repository_config()
+    config = get_repository_config()
     if not config:
         raise RepositoryError("No configuration found", 404, "NOT_FOUND")
     
-    return jsonify({"ok": True, "features": config.get('features', {})})
+    return conditional_json({"ok": True, "features": config.get('features', {})})
 
 
 @app.route("/admin/features", methods=["PUT"])
+@requires("admin")
 def update_features():
     """Update features configuration."""
-    # Must be admin
-    principal = require_scopes(["admin"])
-    
     try:
         data = request.get_json()
         if not data:
             raise RepositoryError("Missing request body", 400, "INVALID_REQUEST")
         
         # TODO: Implement features update in config_db
+        invalidate_config_cache()
         return jsonify({"ok": True, "message": "Features update not yet implemented"})
     except RepositoryError:
         raise
@@ -440,10 +762,10 @@ def update_features():
 
 
 @app.route("/v1/<namespace>/<name>/<version>/<variant>/blob", methods=["PUT"])
+@requires("write")
 def publish_artifact_blob(namespace: str, name: str, version: str, variant: str):
     """Publish artifact blob endpoint."""
-    # Auth check
-    principal = require_scopes(["write"])
+    principal = g.principal
     
     # Parse and normalize entity
     entity = normalize_entity({
@@ -451,35 +773,25 @@ def publish_artifact_blob(namespace: str, name: str, version: str, variant: str)
         "name": name,
         "version": version,
         "variant": variant
-    })
+    }, source="url")
     
     # Validate entity
     validate_entity(entity)
     
-    # Read blob data
-    blob_data = request.get_data()
-    if len(blob_data) > SCHEMA["ops"]["limits"]["max_request_body_bytes"]:
+    # Reject a declared oversize body before reading any of it; bodies
+    # without a Content-Length are still capped while streaming
+    max_bytes = SCHEMA["ops"]["limits"]["max_request_body_bytes"]
+    if request.content_length is not None and request.content_length > max_bytes:
         raise RepositoryError("Blob too large", 413, "BLOB_TOO_LARGE")
     
-    # Compute digest
-    digest = compute_blob_digest(blob_data)
-    blob_size = len(blob_data)
-    
-    # Store blob
-    blob_path = get_blob_path(digest)
-    blob_path.parent.mkdir(parents=True, exist_ok=True)
-    
-    if not blob_path.exists():
-        with open(blob_path, "wb") as f:
-            f.write(blob_data)
+    # Stream blob to disk, computing its digest on the way
+    digest, blob_size = store_blob_stream(request.stream, max_bytes)
     
     # Store metadata
     artifact_key = f"artifact/{entity['namespace']}/{entity['name']}/{entity['version']}/{entity['variant']}"
+    index_key = (entity['namespace'], entity['name'])
     
-    if kv_store.get(artifact_key) is not None:
-        raise RepositoryError("Artifact already exists", 409, "ALREADY_EXISTS")
-    
-    now = datetime.utcnow().isoformat() + "Z"
+    now = request_timestamp()
     meta = {
         "namespace": entity["namespace"],
         "name": entity["name"],
@@ -491,23 +803,22 @@ def publish_artifact_blob(namespace: str, name: str, version: str, variant: str)
         "created_by": principal.get("sub", "unknown")
     }
     
-    kv_store.put(artifact_key, meta)
-    
-    # Update index
-    index_key = f"{entity['namespace']}/{entity['name']}"
-    if index_key not in index_store:
-        index_store[index_key] = []
-    
-    index_store[index_key].append({
-        "namespace": entity["namespace"],
-        "name": entity["name"],
-        "version": entity["version"],
-        "variant": entity["variant"],
-        "blob_digest": digest
-    })
-    
-    # Sort by version (simple string sort for MVP)
-    index_store[index_key].sort(key=lambda x: x["version"], reverse=True)
+    # The existence check, metadata write and index update must not
+    # interleave with another publish of the same package
+    with index_lock(index_key):
+        if kv_store.get(artifact_key) is not None:
+            raise RepositoryError("Artifact already exists", 409, "ALREADY_EXISTS")
+        
+        # Blocks until the batch containing this write has been fsynced
+        metadata_writer.put(artifact_key, meta)
+        
+        # Update index: binary-search insert keeps rows in version order
+        # without re-sorting the whole list on every publish
+        bisect.insort(
+            index_store.setdefault(index_key, []),
+            (version_sort_key(entity["version"]), index_entry(meta)),
+            key=_row_sort_key
+        )
     
     return jsonify({
         "ok": True,
@@ -517,18 +828,16 @@ def publish_artifact_blob(namespace: str, name: str, version: str, variant: str)
 
 
 @app.route("/v1/<namespace>/<name>/<version>/<variant>/blob", methods=["GET"])
+@requires("read")
 def fetch_artifact_blob(namespace: str, name: str, version: str, variant: str):
     """Fetch artifact blob endpoint."""
-    # Auth check
-    require_scopes(["read"])
-    
     # Parse and normalize entity
     entity = normalize_entity({
         "namespace": namespace,
         "name": name,
         "version": version,
         "variant": variant
-    })
+    }, source="url")
     
     # Validate entity
     validate_entity(entity)
@@ -542,42 +851,79 @@ def fetch_artifact_blob(namespace: str, name: str, version: str, variant: str):
     
     # Get blob
     blob_path = get_blob_path(meta["blob_digest"])
-    if not blob_path.exists():
+    if not os.path.exists(blob_path):
         raise RepositoryError("Blob not found", 404, "BLOB_NOT_FOUND")
     
-    return send_file(
-        blob_path,
-        mimetype="application/octet-stream",
-        as_attachment=True,
-        download_name=f"{entity['name']}-{entity['version']}.tar.gz"
+    download_name = f"{entity['name']}-{entity['version']}.tar.gz"
+    
+    # Blobs are content-addressed, so the digest is a strong ETag. With
+    # conditional responses, revalidating clients get a 304 without the file
+    # being read.
+    if BLOB_ACCEL_REDIRECT_PREFIX:
+        # nginx serves the bytes from its internal location; only headers
+        # are produced here
+        clean_digest = blob_path.rpartition("/")[2]
+        response = Response(mimetype="application/octet-stream")
+        response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+        response.set_etag(meta["blob_digest"])
+        response = response.make_conditional(request)
+        # nginx follows X-Accel-Redirect whatever the status, so a 304 (or
+        # 412) must not carry it or the full file would be sent anyway
+        if response.status_code == 200:
+            response.headers["X-Accel-Redirect"] = (
+                f"{BLOB_ACCEL_REDIRECT_PREFIX}/{clean_digest[:2]}/{clean_digest[2:4]}/{clean_digest}"
+            )
+    else:
+        # Full responses go through X-Sendfile when USE_X_SENDFILE is on,
+        # else the server's wsgi.file_wrapper (sendfile on gunicorn/uwsgi)
+        # when one is available.
+        response = send_file(
+            blob_path,
+            mimetype="application/octet-stream",
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=meta["blob_digest"]
+        )
+    
+    # Artifacts can't be overwritten or deleted, so a blob URL never changes
+    # content. Shared caches may only keep it when reads need no auth.
+    response.headers["Cache-Control"] = (
+        f"{'public' if ALLOW_ANON_READ else 'private'}, max-age=31536000, immutable"
     )
+    # RFC 9530 integrity header; only sha-256 has a registered token.
+    # Repr-Digest covers the whole blob, so it stays correct on 206 range
+    # responses and 304s (Content-Digest would have to match the bytes sent)
+    algorithm, _, hex_digest = meta["blob_digest"].partition(":")
+    if algorithm == "sha256":
+        response.headers["Repr-Digest"] = (
+            f"sha-256=:{base64.b64encode(bytes.fromhex(hex_digest)).decode('ascii')}:"
+        )
+    return response
 
 
 @app.route("/v1/<namespace>/<name>/latest", methods=["GET"])
+@requires("read")
 def resolve_latest(namespace: str, name: str):
     """Resolve latest version endpoint."""
-    # Auth check
-    require_scopes(["read"])
+    # Normalize the package coordinates
+    index_key = normalize_package_name(namespace, name)
+    namespace, name = index_key
+    
+    # Query index without the stripe lock, so reads never wait behind a
+    # publish's fsync. bisect.insort (with a C key function) and rows[-1] are
+    # each atomic under the GIL, so a read sees the list before or after an
+    # insert, never mid-update.
+    rows = index_store.get(index_key)
+    latest = rows[-1][1] if rows else None
+    
+    if latest is None:
+        raise RepositoryError("No versions found", 404, "NOT_FOUND")
     
-    # Parse and normalize entity
-    entity = normalize_entity({
+    # Body-derived ETag: pollers get a 304 until a newer version lands
+    return conditional_json({
         "namespace": namespace,
         "name": name,
-        "version": "",
-        "variant": ""
-    })
-    
-    # Query index
-    index_key = f"{entity['namespace']}/{entity['name']}"
-    rows = index_store.get(index_key, [])
-    
-    if not rows:
-        raise RepositoryError("No versions found", 404, "NOT_FOUND")
-    
-    latest = rows[0]
-    return jsonify({
-        "namespace": entity["namespace"],
-        "name": entity["name"],
         "version": latest["version"],
         "variant": latest["variant"],
         "blob_digest": latest["blob_digest"]
@@ -585,10 +931,10 @@ def resolve_latest(namespace: str, name: str):
 
 
 @app.route("/v1/<namespace>/<name>/tags/<tag>", methods=["PUT"])
+@requires("write")
 def set_tag(namespace: str, name: str, tag: str):
     """Set tag endpoint."""
-    # Auth check
-    principal = require_scopes(["write"])
+    principal = g.principal
     
     # Parse and normalize entity
     entity = normalize_entity({
@@ -597,7 +943,7 @@ def set_tag(namespace: str, name: str, tag: str):
         "version": "",
         "variant": "",
         "tag": tag
-    })
+    }, source="url")
     
     # Validate entity
     validate_entity(entity)
@@ -610,48 +956,44 @@ def set_tag(namespace: str, name: str, tag: str):
     except Exception as e:
         raise RepositoryError("Invalid JSON", 400, "INVALID_JSON")
     
-    # Check if target exists
     target_key = f"artifact/{entity['namespace']}/{entity['name']}/{body['target_version']}/{body['target_variant']}"
-    if kv_store.get(target_key) is None:
-        raise RepositoryError("Target artifact not found", 404, "TARGET_NOT_FOUND")
-    
-    # Store tag
-    now = datetime.utcnow().isoformat() + "Z"
     tag_key = f"tag/{entity['namespace']}/{entity['name']}/{entity['tag']}"
+    now = request_timestamp()
     
-    kv_store.put(tag_key, {
-        "namespace": entity["namespace"],
-        "name": entity["name"],
-        "tag": entity["tag"],
-        "target_key": target_key,
-        "updated_at": now,
-        "updated_by": principal.get("sub", "unknown")
-    })
+    with index_lock((entity['namespace'], entity['name'])):
+        # Check if target exists
+        if kv_store.get(target_key) is None:
+            raise RepositoryError("Target artifact not found", 404, "TARGET_NOT_FOUND")
+        
+        # Store tag
+        metadata_writer.put(tag_key, {
+            "namespace": entity["namespace"],
+            "name": entity["name"],
+            "tag": entity["tag"],
+            "target_key": target_key,
+            "updated_at": now,
+            "updated_by": principal.get("sub", "unknown")
+        })
     
     return jsonify({"ok": True})
 
 
 @app.route("/v1/<namespace>/<name>/versions", methods=["GET"])
+@requires("read")
 def list_versions(namespace: str, name: str):
     """List all versions of a package."""
-    # Auth check
-    require_scopes(["read"])
+    # Normalize the package coordinates
+    index_key = normalize_package_name(namespace, name)
+    namespace, name = index_key
     
-    # Parse and normalize entity
-    entity = normalize_entity({
+    # Query index without the stripe lock (see resolve_latest): list() takes
+    # an atomic snapshot, which is then reversed at leisure
+    rows = [row for _, row in reversed(list(index_store.get(index_key, ())))]
+    
+    # Body-derived ETag: pollers get a 304 until the version list changes
+    return conditional_json({
         "namespace": namespace,
         "name": name,
-        "version": "",
-        "variant": ""
-    })
-    
-    # Query index
-    index_key = f"{entity['namespace']}/{entity['name']}"
-    rows = index_store.get(index_key, [])
-    
-    return jsonify({
-        "namespace": entity["namespace"],
-        "name": entity["name"],
         "versions": rows
     })
 
@@ -665,7 +1007,12 @@ def health():
 @app.route("/schema", methods=["GET"])
 def get_schema():
     """Return the repository schema."""
-    return jsonify(SCHEMA)
+    response = Response(SCHEMA_JSON_BYTES, mimetype="application/json")
+    response.set_etag(SCHEMA_ETAG)
+    # Fixed for the process lifetime; after a redeploy, clients revalidate
+    # against the ETag once the hour is up
+    response.headers["Cache-Control"] = "public, max-age=3600"
+    return response.make_conditional(request)
 
 
 @app.route("/rocksdb/stats", methods=["GET"])
@@ -692,11 +1039,10 @@ def rocksdb_keys():
         prefix = request.args.get("prefix", None)
         limit = int(request.args.get("limit", "100"))
         
-        # Pass limit to keys() method for efficiency
-        keys = kv_store.keys(prefix, limit=limit)
-        
-        # Check if we hit the limit (might have more keys)
-        truncated = len(keys) == limit
+        # Read one key past the limit to tell whether more keys exist
+        keys = list(kv_store.keys(prefix, limit=limit + 1))
+        truncated = len(keys) > limit
+        keys = keys[:limit]
         
         return jsonify({
             "ok": True,
@@ -720,7 +1066,7 @@ def rocksdb_dashboard():
         stats = kv_store.get_stats()
         
         # Sample some keys for display (limit to avoid loading all keys)
-        sample_keys = kv_store.keys(limit=20)
+        sample_keys = list(kv_store.keys(limit=20))
         total_keys = stats['total_keys']
         
         html = f"""
@@ -935,12 +1281,15 @@ def handle_repository_error(error):
     }), error.status_code
 
 
+@app.errorhandler(HTTPException)
+def handle_http_exception(error):
+    """Pass HTTP errors (404, 405, ...) through unchanged."""
+    return error
+
+
 @app.errorhandler(Exception)
 def handle_exception(error):
     """Handle unexpected errors."""
-    if isinstance(error, HTTPException):
-        return error
-    
     app.logger.error(f"Unexpected error: {error}", exc_info=True)
     return jsonify({
         "error": {
@@ -3,21 +3,39 @@ RocksDB Key-Value Store Implementation
 Provides a persistent KV store with HTTP-accessible stats and dashboard.
 """
 
-import json
+import array
+import logging
+import os
+import threading
 import time
+import weakref
 from pathlib import Path
-from typing import Any, Dict, Optional, List
-from rocksdict import Rdict, Options
+from typing import Any, Dict, Optional, List, Iterator, Iterable, Tuple
+import orjson
+from rocksdict import (
+    Rdict, Options, WriteBatch, WriteOptions,
+    BlockBasedOptions, Cache, DBCompressionType,
+)
+
+logger = logging.getLogger(__name__)
+
+# Slots in RocksDBStore._counters
+_OP_GET, _OP_PUT, _OP_DEL, _OP_CAS, _CACHE_HIT, _CACHE_MISS = range(6)
+
+# How long get_stats() reuses its last result, so dashboard polls from
+# several clients share one computation
+STATS_CACHE_TTL_SECONDS = 1.0
 
 
 class RocksDBStore:
     """Wrapper for RocksDB operations with stats tracking."""
     
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, block_cache_size: int = 268435456):
         """Initialize RocksDB instance.
         
         Args:
             db_path: Path to the RocksDB database directory
+            block_cache_size: Bytes of RAM for the shared block cache (default 256MB)
         """
         self.db_path = Path(db_path)
         self.db_path.mkdir(parents=True, exist_ok=True)
@@ -30,21 +48,26 @@ class RocksDBStore:
         options.set_max_write_buffer_number(3)
         options.set_target_file_size_base(67108864)  # 64MB
         
+        # Keep hot blocks in RAM and let bloom filters skip SST files that
+        # can't contain a key, so negative lookups rarely touch disk
+        table_options = BlockBasedOptions()
+        table_options.set_block_cache(Cache(block_cache_size))
+        table_options.set_bloom_filter(10, False)  # ~1% false positives
+        table_options.set_cache_index_and_filter_blocks(True)
+        options.set_block_based_table_factory(table_options)
+        options.set_compression_type(DBCompressionType.lz4())
+        
         # Open database
         self.db = Rdict(str(self.db_path), options=options)
         
-        # Stats tracking
-        self.stats = {
-            'operations': {
-                'get': 0,
-                'put': 0,
-                'delete': 0,
-                'cas_put': 0,
-            },
-            'cache_hits': 0,
-            'cache_misses': 0,
-            'start_time': time.time(),
-        }
+        # Serializes cas_put's check-then-write
+        self._cas_lock = threading.Lock()
+        
+        # Stats tracking: flat unsigned counters indexed by the _OP_*/_CACHE_*
+        # slots, so the hot path bumps an array entry instead of nested dicts
+        self._counters = array.array('Q', [0] * 6)
+        self.start_time = time.time()
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
     
     def get(self, key: str) -> Optional[Any]:
         """Retrieve value from RocksDB.
@@ -55,20 +78,20 @@ class RocksDBStore:
         Returns:
             Deserialized value or None if key doesn't exist
         """
-        self.stats['operations']['get'] += 1
+        self._counters[_OP_GET] += 1
         
         try:
             value_bytes = self.db.get(key.encode('utf-8'))
             if value_bytes is None:
-                self.stats['cache_misses'] += 1
+                self._counters[_CACHE_MISS] += 1
                 return None
             
-            self.stats['cache_hits'] += 1
-            # Deserialize JSON value
-            return json.loads(value_bytes.decode('utf-8'))
-        except Exception as e:
-            print(f"Error getting key {key}: {e}")
-            self.stats['cache_misses'] += 1
+            self._counters[_CACHE_HIT] += 1
+            # Deserialize JSON value (orjson parses the bytes directly)
+            return orjson.loads(value_bytes)
+        except Exception:
+            logger.exception("Error getting key %s", key)
+            self._counters[_CACHE_MISS] += 1
             return None
     
     def put(self, key: str, value: Any, _internal: bool = False) -> None:
@@ -80,15 +103,62 @@ class RocksDBStore:
             _internal: If True, don't increment operation counter (internal use)
         """
         if not _internal:
-            self.stats['operations']['put'] += 1
+            self._counters[_OP_PUT] += 1
+        
+        # Serialize value as JSON (orjson produces UTF-8 bytes directly)
+        self.db[key.encode('utf-8')] = orjson.dumps(value)
+    
+    def put_many(self, items: Iterable[Tuple[str, Any]], sync: bool = False,
+                 disable_wal: bool = False) -> None:
+        """Store several values atomically in a single WriteBatch.
+        
+        Use this instead of looping over put() for bulk loads: the whole batch
+        takes one trip through the write path.
+        
+        Args:
+            items: (key, value) pairs to store (values will be JSON serialized)
+            sync: If True, fsync the WAL before returning
+            disable_wal: If True, skip the WAL entirely. Only for idempotent
+                refreshes that can be replayed after a crash.
+        """
+        self.put_many_serialized(
+            ((key, orjson.dumps(value)) for key, value in items),
+            sync=sync,
+            disable_wal=disable_wal,
+        )
+    
+    def put_many_serialized(self, items: Iterable[Tuple[str, bytes]], sync: bool = False,
+                            disable_wal: bool = False) -> None:
+        """Store already-serialized values atomically in a single WriteBatch.
+        
+        Args:
+            items: (key, JSON bytes) pairs, e.g. produced by orjson.dumps
+            sync: If True, fsync the WAL before returning
+            disable_wal: If True, skip the WAL entirely
+        """
+        batch = WriteBatch()
+        count = 0
+        for key, value_bytes in items:
+            batch.put(key.encode('utf-8'), value_bytes)
+            count += 1
+        
+        if not count:
+            return
+        self._counters[_OP_PUT] += count
         
-        # Serialize value as JSON
-        value_json = json.dumps(value)
-        self.db[key.encode('utf-8')] = value_json.encode('utf-8')
+        write_options = WriteOptions()
+        write_options.sync = sync
+        write_options.disable_wal = disable_wal
+        self.db.write(batch, write_options)
     
     def cas_put(self, key: str, value: Any, if_absent: bool = True) -> bool:
         """Conditional store - only store if key doesn't exist (if_absent=True).
         
+        The existence check and the write happen under one lock, so two
+        concurrent cas_put calls for the same key cannot both succeed. The
+        check never deserializes the existing value: key_may_exist() rules
+        out most absent keys via the bloom filters without any I/O.
+        
         Args:
             key: Key to store
             value: Value to store
@@ -97,22 +167,14 @@ class RocksDBStore:
         Returns:
             True if value was stored, False otherwise
         """
-        self.stats['operations']['cas_put'] += 1
+        self._counters[_OP_CAS] += 1
         
-        if if_absent:
-            # Check existence without incrementing get counter (internal operation)
-            try:
-                value_bytes = self.db.get(key.encode('utf-8'))
-                if value_bytes is not None:
-                    return False
-            except KeyError:
-                pass  # Key doesn't exist
-            except Exception as e:
-                # Log unexpected errors but continue with put operation
-                print(f"Warning: Error checking key existence in cas_put: {e}")
-        
-        # Use internal put to avoid double-counting
-        self.put(key, value, _internal=True)
+        key_bytes = key.encode('utf-8')
+        value_bytes = orjson.dumps(value)
+        with self._cas_lock:
+            if if_absent and self.db.key_may_exist(key_bytes) and key_bytes in self.db:
+                return False
+            self.db[key_bytes] = value_bytes
         return True
     
     def delete(self, key: str) -> None:
@@ -121,43 +183,70 @@ class RocksDBStore:
         Args:
             key: Key to delete
         """
-        self.stats['operations']['delete'] += 1
+        self._counters[_OP_DEL] += 1
         
         try:
             del self.db[key.encode('utf-8')]
         except KeyError:
             pass  # Key doesn't exist, that's fine
     
-    def keys(self, prefix: Optional[str] = None, limit: Optional[int] = None) -> List[str]:
-        """List all keys, optionally filtered by prefix.
+    def keys(self, prefix: Optional[str] = None, limit: Optional[int] = None) -> Iterator[str]:
+        """Iterate over keys lazily, optionally filtered by prefix.
+        
+        With a prefix, iteration seeks straight to it and stops at the first
+        key past it. Keys are decoded one at a time, so memory stays constant
+        and a consumer that stops early reads no further.
         
         Args:
             prefix: Optional prefix to filter keys
-            limit: Optional limit on number of keys to return
+            limit: Optional limit on number of keys to yield
             
-        Returns:
-            List of keys (as strings)
+        Yields:
+            Keys (as strings) in key order
         """
-        keys = []
+        if limit is not None and limit <= 0:
+            return
         
         if prefix:
             prefix_bytes = prefix.encode('utf-8')
-            for key in self.db.keys():
-                if key.startswith(prefix_bytes):
-                    keys.append(key.decode('utf-8'))
-                    if limit and len(keys) >= limit:
-                        break
+            raw_keys = self.db.keys(from_key=prefix_bytes)
         else:
-            for key in self.db.keys():
-                keys.append(key.decode('utf-8'))
-                if limit and len(keys) >= limit:
-                    break
+            prefix_bytes = b''
+            raw_keys = self.db.keys()
         
-        return keys
+        count = 0
+        for key in raw_keys:
+            if not key.startswith(prefix_bytes):
+                break
+            yield key.decode('utf-8')
+            count += 1
+            if count == limit:
+                break
+    
+    def scan(self, prefix: str) -> Iterator[Tuple[str, Any]]:
+        """Iterate over (key, value) pairs whose key starts with prefix.
+        
+        Seeks directly to the prefix and stops at the first key past it, so
+        only the matching range is read. Pairs are yielded in key order.
+        
+        Args:
+            prefix: Key prefix to scan
+            
+        Yields:
+            (key, deserialized value) tuples
+        """
+        prefix_bytes = prefix.encode('utf-8')
+        for key, value_bytes in self.db.items(from_key=prefix_bytes):
+            if not key.startswith(prefix_bytes):
+                break
+            yield key.decode('utf-8'), orjson.loads(value_bytes)
     
     def count(self, prefix: Optional[str] = None) -> int:
         """Count keys, optionally filtered by prefix.
         
+        With a prefix, iteration seeks straight to it and stops at the first
+        key past it. Keys are counted without being collected.
+        
         Args:
             prefix: Optional prefix to filter keys
             
@@ -165,49 +254,87 @@ class RocksDBStore:
             Number of keys
             
         Note:
-            This method iterates through all keys, which can be expensive for large
-            datasets. In production, consider maintaining separate counters updated
-            during put/delete operations for better performance.
+            Counting every key is still O(N); use estimate_num_keys() where an
+            approximate figure will do.
         """
+        if not prefix:
+            return sum(1 for _ in self.db.keys())
+        
+        prefix_bytes = prefix.encode('utf-8')
         count = 0
+        for key in self.db.keys(from_key=prefix_bytes):
+            if not key.startswith(prefix_bytes):
+                break
+            count += 1
+        return count
+    
+    def get_int_property(self, name: str) -> Optional[int]:
+        """Read an integer RocksDB property (e.g. "rocksdb.estimate-num-keys").
         
-        if prefix:
-            prefix_bytes = prefix.encode('utf-8')
-            for key in self.db.keys():
-                if key.startswith(prefix_bytes):
-                    count += 1
-        else:
-            for key in self.db.keys():
-                count += 1
+        Args:
+            name: Property name
+            
+        Returns:
+            Property value, or None if RocksDB doesn't report it
+        """
+        return self.db.property_int_value(name)
+    
+    def estimate_num_keys(self) -> int:
+        """Return RocksDB's O(1) estimate of the total number of keys.
         
-        return count
+        Returns:
+            Approximate key count, falling back to an exact count if RocksDB
+            provides no estimate
+        """
+        estimate = self.get_int_property('rocksdb.estimate-num-keys')
+        return estimate if estimate is not None else self.count()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get RocksDB statistics.
         
+        Results are reused for STATS_CACHE_TTL_SECONDS.
+        
         Returns:
             Dictionary with database statistics
         """
-        uptime = time.time() - self.stats['start_time']
-        total_ops = sum(self.stats['operations'].values())
+        now = time.monotonic()
+        cached = self._stats_cache
+        if cached is not None and now - cached[0] < STATS_CACHE_TTL_SECONDS:
+            return cached[1]
+        
+        counters = self._counters
+        operations = {
+            'get': counters[_OP_GET],
+            'put': counters[_OP_PUT],
+            'delete': counters[_OP_DEL],
+            'cas_put': counters[_OP_CAS],
+        }
+        hits = counters[_CACHE_HIT]
+        misses = counters[_CACHE_MISS]
+        
+        uptime = time.time() - self.start_time
+        total_ops = sum(operations.values())
         
         # Calculate cache hit rate
-        total_reads = self.stats['cache_hits'] + self.stats['cache_misses']
-        cache_hit_rate = (self.stats['cache_hits'] / total_reads * 100) if total_reads > 0 else 0.0
+        total_reads = hits + misses
+        cache_hit_rate = (hits / total_reads * 100) if total_reads > 0 else 0.0
         
-        return {
+        stats = {
             'database_path': str(self.db_path),
-            'total_keys': self.count(),
+            # Estimated so that polling stats never walks the whole database
+            'total_keys': self.estimate_num_keys(),
             'uptime_seconds': round(uptime, 2),
-            'operations': self.stats['operations'].copy(),
+            'operations': operations,
             'total_operations': total_ops,
             'cache_stats': {
-                'hits': self.stats['cache_hits'],
-                'misses': self.stats['cache_misses'],
+                'hits': hits,
+                'misses': misses,
                 'hit_rate_percent': round(cache_hit_rate, 2),
             },
             'ops_per_second': round(total_ops / uptime, 2) if uptime > 0 else 0.0,
         }
+        self._stats_cache = (now, stats)
+        return stats
     
     def close(self) -> None:
         """Close the RocksDB database."""
@@ -220,3 +347,124 @@ class RocksDBStore:
     def __del__(self):
         """Cleanup on deletion."""
         self.close()
+
+
+class _PendingWrite:
+    """A queued write and the event its caller waits on."""
+    
+    __slots__ = ('key', 'value_bytes', 'done', 'error')
+    
+    def __init__(self, key: str, value_bytes: bytes):
+        self.key = key
+        self.value_bytes = value_bytes
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class GroupCommitWriter:
+    """Coalesces durable writes from concurrent callers into one synced batch.
+    
+    Each put() blocks until its write has been committed with sync=True, but a
+    background thread drains everything queued within a short window into a
+    single WriteBatch, so N concurrent writers pay for roughly one fsync.
+    
+    The flusher thread is (re)started on demand: after a fork() the child
+    starts its own on first use, and if the thread ever dies its waiting
+    callers get an error instead of blocking forever.
+    """
+    
+    # How often a blocked put() checks that the flusher is still alive
+    LIVENESS_CHECK_SECONDS = 1.0
+    
+    def __init__(self, store: RocksDBStore, max_delay: float = 0.005, max_batch: int = 256):
+        """Start the background flusher.
+        
+        Args:
+            store: Store to write batches to
+            max_delay: Seconds to wait for more writes before flushing
+            max_batch: Flush immediately once this many writes are queued
+        """
+        self.store = store
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self._reset()
+        with self._lock:
+            self._ensure_flusher()
+        
+        # Threads don't survive fork(); the child gets fresh state and
+        # starts its own flusher on first put()
+        if hasattr(os, 'register_at_fork'):
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()._reset())
+    
+    def _reset(self) -> None:
+        """Create empty queue state with no flusher running."""
+        self._pending: List[_PendingWrite] = []
+        self._lock = threading.Lock()
+        self._has_pending = threading.Event()
+        self._batch_full = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _ensure_flusher(self) -> None:
+        """Start the flusher thread if it isn't running. Call with _lock held."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='rocksdb-group-commit', daemon=True)
+            self._thread.start()
+    
+    def put(self, key: str, value: Any) -> None:
+        """Queue a write and block until it is durably committed.
+        
+        Args:
+            key: Key to store
+            value: Value to store (will be JSON serialized)
+            
+        Raises:
+            TypeError: If the value can't be JSON serialized (raised here,
+                before queueing, so it can't fail other callers' writes)
+            RuntimeError: If the flusher stopped before reporting on this
+                write; the write may or may not have been committed
+            BaseException: Whatever the batch write raised, if it failed
+        """
+        write = _PendingWrite(key, orjson.dumps(value))
+        with self._lock:
+            self._ensure_flusher()
+            thread = self._thread
+            self._pending.append(write)
+            self._has_pending.set()
+            if len(self._pending) >= self.max_batch:
+                self._batch_full.set()
+        
+        while not write.done.wait(self.LIVENESS_CHECK_SECONDS):
+            if not thread.is_alive() and not write.done.is_set():
+                raise RuntimeError("Group commit flusher stopped before completing the write")
+        if write.error is not None:
+            raise write.error
+    
+    def _run(self) -> None:
+        """Flush queued writes until the thread is stopped."""
+        try:
+            while True:
+                self._has_pending.wait()
+                self._batch_full.wait(self.max_delay)
+                
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    self._has_pending.clear()
+                    self._batch_full.clear()
+                
+                try:
+                    self.store.put_many_serialized(((w.key, w.value_bytes) for w in batch), sync=True)
+                except BaseException as e:
+                    for w in batch:
+                        w.error = e
+                
+                for w in batch:
+                    w.done.set()
+        finally:
+            # Only reached if the loop itself fails; don't strand queued callers
+            error = RuntimeError("Group commit flusher stopped")
+            with self._lock:
+                batch, self._pending = self._pending, []
+            for w in batch:
+                w.error = error
+                w.done.set()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tests for GroupCommitWriter batching and failure isolation.
+"""
+
+import os
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+from rocksdb_store import RocksDBStore, GroupCommitWriter
+
+
+class RecordingStore(RocksDBStore):
+    """RocksDBStore that records batch sizes and can fail the next batch."""
+    
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.batch_sizes = []
+        self.fail_next = None
+    
+    def put_many_serialized(self, items, sync=False, disable_wal=False):
+        items = list(items)
+        if self.fail_next is not None:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        self.batch_sizes.append(len(items))
+        super().put_many_serialized(items, sync=sync, disable_wal=disable_wal)
+
+
+def put_concurrently(writer, items):
+    """Call writer.put for every (key, value) from its own thread; return errors by key."""
+    errors = {}
+    barrier = threading.Barrier(len(items))
+    
+    def worker(key, value):
+        barrier.wait()
+        try:
+            writer.put(key, value)
+        except BaseException as e:
+            errors[key] = e
+    
+    threads = [threading.Thread(target=worker, args=item) for item in items]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=10)
+    return errors
+
+
+def test_concurrent_puts_share_batches(tmp_path):
+    """Writers queued within max_delay are committed together."""
+    store = RecordingStore(str(tmp_path / 'db'))
+    writer = GroupCommitWriter(store, max_delay=0.2)
+    
+    errors = put_concurrently(writer, [(f'k{i}', {'i': i}) for i in range(20)])
+    
+    assert errors == {}
+    assert sum(store.batch_sizes) == 20
+    assert len(store.batch_sizes) < 20
+    assert [store.get(f'k{i}') for i in range(20)] == [{'i': i} for i in range(20)]
+
+
+def test_unserializable_value_fails_only_its_caller(tmp_path):
+    """A value orjson can't encode raises for that caller; the others commit."""
+    store = RecordingStore(str(tmp_path / 'db'))
+    writer = GroupCommitWriter(store, max_delay=0.2)
+    
+    items = [(f'k{i}', {'i': i}) for i in range(5)] + [('bad', {1j})]
+    errors = put_concurrently(writer, items)
+    
+    assert list(errors) == ['bad']
+    assert isinstance(errors['bad'], TypeError)
+    assert store.get('bad') is None
+    assert [store.get(f'k{i}') for i in range(5)] == [{'i': i} for i in range(5)]
+
+
+def test_failed_batch_is_reported_and_writer_recovers(tmp_path):
+    """A failing batch write raises in its callers; later puts still commit."""
+    store = RecordingStore(str(tmp_path / 'db'))
+    writer = GroupCommitWriter(store)
+    
+    store.fail_next = OSError('disk full')
+    with pytest.raises(OSError):
+        writer.put('k1', 1)
+    
+    writer.put('k2', 2)
+    assert store.get('k1') is None
+    assert store.get('k2') == 2
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='requires fork()')
+def test_writer_works_after_fork(tmp_path):
+    """A forked child starts its own flusher instead of hanging."""
+    store = RocksDBStore(str(tmp_path / 'db'))
+    writer = GroupCommitWriter(store)
+    writer.put('parent', 1)
+    
+    pid = os.fork()
+    if pid == 0:
+        try:
+            writer.put('child', 2)
+            os._exit(0 if store.get('child') == 2 else 1)
+        except BaseException:
+            os._exit(2)
+    
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+    writer.put('parent-again', 3)
+    assert store.get('parent-again') == 3
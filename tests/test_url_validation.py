@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Tests that URL path segments are validated against the full constraint pattern.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+# app opens its RocksDB and blob directories on import; keep them out of /tmp/data
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='goodrepo-test-'))
+
+import app as app_module
+
+client = app_module.app.test_client()
+
+
+def auth_headers():
+    """Log in as the default admin and return an Authorization header."""
+    response = client.post('/auth/login', json={'username': 'admin', 'password': 'admin'})
+    return {'Authorization': 'Bearer ' + response.get_json()['token']}
+
+
+def test_newline_suffixed_segments_are_rejected():
+    """A %0A-suffixed segment must not pass a "$"-anchored constraint."""
+    headers = auth_headers()
+    
+    response = client.put('/v1/urltest/pkg/1.0.0/linux/blob', data=b'payload', headers=headers)
+    assert response.status_code == 201
+    
+    # Version: would otherwise publish a second "1.0.0\n" that becomes latest
+    response = client.put('/v1/urltest/pkg/1.0.0%0A/linux/blob', data=b'payload', headers=headers)
+    assert response.status_code == 400
+    
+    # Namespace: would otherwise create a shadow "urltest\n" namespace
+    response = client.put('/v1/urltest%0A/pkg/1.0.0/linux/blob', data=b'payload', headers=headers)
+    assert response.status_code == 400
+    
+    # Tag
+    response = client.put(
+        '/v1/urltest/pkg/tags/stable%0A',
+        json={'target_version': '1.0.0', 'target_variant': 'linux'},
+        headers=headers
+    )
+    assert response.status_code == 400
+    
+    response = client.get('/v1/urltest/pkg/latest', headers=headers)
+    assert response.get_json()['version'] == '1.0.0'
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Tests for version ordering used by the latest/versions endpoints.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'backend'))
+
+# app opens its RocksDB and blob directories on import; keep them out of /tmp/data
+os.environ.setdefault('DATA_DIR', tempfile.mkdtemp(prefix='goodrepo-test-'))
+
+from app import version_sort_key
+
+
+def test_numeric_parts_compare_as_integers():
+    """10.0.0 is newer than 2.0.0, not older as a string compare would say."""
+    assert version_sort_key('10.0.0') > version_sort_key('2.0.0')
+    assert version_sort_key('1.10.0') > version_sort_key('1.9.0')
+
+
+def test_prerelease_sorts_before_release():
+    """A pre-release precedes the release it leads up to."""
+    assert version_sort_key('1.0.0-rc1') < version_sort_key('1.0.0')
+    assert version_sort_key('1.0.0-rc1') > version_sort_key('0.9.0')
+
+
+def test_build_metadata_is_ignored():
+    """Build metadata after '+' does not affect ordering."""
+    assert version_sort_key('1.0.0+build.5') == version_sort_key('1.0.0')
+    assert version_sort_key('1.0.0-rc1+abc') == version_sort_key('1.0.0-rc1')
+
+
+def test_latest_is_last_after_sorting():
+    """Sorting by the key puts the newest release last, as resolve_latest expects."""
+    versions = ['2.0.0', '10.0.0', '1.0.0-rc1', '1.0.0', '1.5.0+build']
+    assert sorted(versions, key=version_sort_key) == [
+        '1.0.0-rc1', '1.0.0', '1.5.0+build', '2.0.0', '10.0.0'
+    ]